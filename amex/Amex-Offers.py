@@ -2,20 +2,26 @@
 # Amex Offers → Google Sheet (attach-to-Chrome, resilient tile parsing, micro-batched writes)
 # Added: post-pass refresh cycles to surface >100 hidden offers
 
-import os, re, sys, time, random, subprocess
+import hashlib, json, os, queue, re, sys, threading, time, subprocess
 from datetime import datetime
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
 import gspread
 from dotenv import load_dotenv
 from google.oauth2.service_account import Credentials
 
 from selenium import webdriver
-from selenium.common.exceptions import InvalidSessionIdException, WebDriverException
+from selenium.common.exceptions import (
+    InvalidSessionIdException, StaleElementReferenceException, TimeoutException, WebDriverException
+)
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
+from webdriver_manager.core.os_manager import ChromeType, OperationSystemManager
 
 # -------------------------------
 # ENV
@@ -47,18 +53,20 @@ OFFERS_ROOT = "https://global.americanexpress.com/offers"
 OFFERS_KEY  = "https://global.americanexpress.com/offers?account_key="
 
 # Timing
-PAGE_PAUSE   = 0.7
-SMALL_PAUSE  = 0.25
-CLICK_PAUSE  = 0.35
 SCROLL_STEP  = 650
-SCROLL_DELAY = 0.11
-MICRO_BATCH  = 3  # flush to Sheets every 3 rows
+MICRO_BATCH  = 500  # rows are flushed at end of pass; this only caps the buffer
 
 # New: refresh rounds after a full pass (to reveal >100 offers)
 MAX_REFRESH_ROUNDS = int(os.getenv("AMEX_REFRESH_ROUNDS", "3"))
 
-# Buffer
+# Buffers
 APPEND_BUFFER: List[List[str]] = []
+LOG_BUFFER: List[List[str]] = []
+LOG_FLUSH_AT = 50
+LOG_RETRY_AFTER = 30.0  # seconds to hold off early flushes after a failed one (e.g. a 429)
+LOG_MAX_ROWS = 2000     # oldest log rows are dropped past this while Sheets keeps failing
+LOG_LOCK = threading.Lock()  # sheet_log is also called from the uploader thread
+LOG_FAILED_AT = 0.0
 
 # -------------------------------
 # Google Sheets
@@ -66,6 +74,9 @@ APPEND_BUFFER: List[List[str]] = []
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
 CREDS  = Credentials.from_service_account_file(SA_PATH, scopes=SCOPES)
 SHEET  = gspread.authorize(CREDS).open(SHEET_NAME)
+# One gspread client/requests session is shared by the uploader thread and the main
+# thread; every Sheets call after startup goes through this lock
+SHEETS_LOCK = threading.RLock()
 
 HEADERS = (
     "Card Holder","Last Four","Card Name","Brand",
@@ -86,51 +97,96 @@ OFFERS_WS = _ws(SHEET, "Card Offers", HEADERS)
 LOG_WS    = _ws(SHEET, "Log", ("Time","Level","Function","Message"))
 
 def sheet_log(level, func, msg):
+    with LOG_LOCK:
+        LOG_BUFFER.append([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), level, func, msg])
+        due = len(LOG_BUFFER) > LOG_FLUSH_AT and time.time() - LOG_FAILED_AT >= LOG_RETRY_AFTER
+    if due:
+        flush_log_buffer()
+
+def flush_log_buffer():
+    global LOG_BUFFER, LOG_FAILED_AT
+    with LOG_LOCK:
+        rows, LOG_BUFFER = LOG_BUFFER, []
+    if not rows: return
     try:
-        LOG_WS.append_row([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), level, func, msg],
-                          value_input_option="RAW", insert_data_option="INSERT_ROWS")
+        with SHEETS_LOCK:
+            LOG_WS.append_rows(rows, value_input_option="RAW", insert_data_option="INSERT_ROWS")
     except Exception:
-        pass
+        with LOG_LOCK:
+            LOG_FAILED_AT = time.time()
+            LOG_BUFFER[:0] = rows  # keep them for the next flush
+            del LOG_BUFFER[:-LOG_MAX_ROWS]
 
 def append_rows_now(rows: List[List[str]]):
     if not rows: return
     try:
-        OFFERS_WS.append_rows(rows, value_input_option="RAW", insert_data_option="INSERT_ROWS")
+        with SHEETS_LOCK:
+            OFFERS_WS.append_rows(rows, value_input_option="RAW", insert_data_option="INSERT_ROWS")
         print(f"Appended {len(rows)} row(s).")
     except Exception as exc:
         sheet_log("ERROR","append_rows",str(exc))
 
+# Appends run on a worker thread so the click loop never waits on a Sheets round-trip
+UPLOAD_Q: "queue.Queue[List[List[str]]]" = queue.Queue()
+
+def _uploader():
+    while True:
+        rows = UPLOAD_Q.get()
+        try:
+            append_rows_now(rows)
+        finally:
+            UPLOAD_Q.task_done()
+
+threading.Thread(target=_uploader, name="sheets-upload", daemon=True).start()
+
 def flush_buffer():
+    """Hand the buffered rows to the uploader; UPLOAD_Q.join() waits for them to land."""
     global APPEND_BUFFER
     if APPEND_BUFFER:
-        append_rows_now(APPEND_BUFFER)
+        UPLOAD_Q.put(APPEND_BUFFER)
         APPEND_BUFFER = []
 
-def dedupe_rows() -> int:
-    rows = OFFERS_WS.get_all_values()
-    seen = set(); sid = OFFERS_WS._properties["sheetId"]; req = []
-    for i in range(len(rows)-1, 0, -1):
-        key = tuple(rows[i])
-        if key in seen:
-            req.append({"deleteRange":{"range":{"sheetId":sid,"startRowIndex":i,"endRowIndex":i+1},"shiftDimension":"ROWS"}})
-        else:
-            seen.add(key)
-    if req: OFFERS_WS.spreadsheet.batch_update({"requests": req})
-    return len(req)
-
-def reset_filters():
-    values = OFFERS_WS.get_all_values()
-    last_row = max(1, len(values)); last_col = len(HEADERS)
-    sid = OFFERS_WS._properties["sheetId"]
-    try:
-        SHEET.batch_update({"requests":[
+def row_key(row) -> int:
+    """64-bit blake2b digest of a sheet row; cells joined with the unit separator so they can't run together."""
+    text = "\x1f".join(str(c) for c in row)
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+def dedupe_and_reset_filters() -> int:
+    """Drop duplicate rows and re-apply the filter in one batch_update; returns rows removed."""
+    with SHEETS_LOCK:  # the read and the deletes must see the same rows
+        rows = OFFERS_WS.get_all_values()
+        seen: Dict[int, List[int]] = {}; sid = OFFERS_WS._properties["sheetId"]; dups = []
+        for i in range(len(rows)-1, 0, -1):
+            # A digest match is only a candidate: nothing is deleted without an exact row match
+            kept = seen.setdefault(row_key(rows[i]), [])
+            if any(rows[j] == rows[i] for j in kept):
+                dups.append(i)
+            else:
+                kept.append(i)
+        # dups runs bottom-up: fold adjacent rows into one [start, end) span, keeping that order
+        spans = []
+        for i in dups:
+            if spans and spans[-1][0] == i + 1: spans[-1][0] = i
+            else: spans.append([i, i + 1])
+        deletes = [{"deleteRange":{"range":{"sheetId":sid,"startRowIndex":a,"endRowIndex":b},"shiftDimension":"ROWS"}}
+                   for a, b in spans]
+        last_row = max(1, len(rows) - len(dups)); last_col = len(HEADERS)
+        filters = [
             {"clearBasicFilter":{"sheetId":sid}},
             {"setBasicFilter":{"filter":{"range":{
                 "sheetId":sid,"startRowIndex":0,"endRowIndex":last_row,"startColumnIndex":0,"endColumnIndex":last_col
             }}}}
-        ]})
-    except Exception:
-        pass
+        ]
+        try:
+            SHEET.batch_update({"requests": deletes + filters})
+        except Exception:
+            # The batch is atomic – don't let a filter hiccup cost us the dedupe
+            if deletes: SHEET.batch_update({"requests": deletes})
+            try:
+                SHEET.batch_update({"requests": filters})
+            except Exception:
+                pass
+        return len(dups)
 
 # -------------------------------
 # Attach to Chrome
@@ -152,6 +208,34 @@ def ensure_debug_chrome():
     except Exception as exc:
         print(f"[attach] Couldn't auto-launch Chrome: {exc}")
 
+DRIVER_CACHE_PATH = os.path.join(HERE, ".chromedriver.json")
+
+def _driver_path() -> str:
+    """
+    ChromeDriverManager().install() checks the network for a matching driver on
+    every call. Cache the resolved path keyed on the installed Chrome version and
+    only reinstall when Chrome updates.
+    """
+    try:
+        chrome_ver = OperationSystemManager().get_browser_version_from_os(ChromeType.GOOGLE) or ""
+    except Exception:
+        chrome_ver = ""
+    try:
+        with open(DRIVER_CACHE_PATH, encoding="utf-8") as fh:
+            cached = json.load(fh)
+        if chrome_ver and cached.get("chrome") == chrome_ver and os.path.isfile(cached.get("path", "")):
+            return cached["path"]
+    except (OSError, ValueError):
+        pass
+    path = ChromeDriverManager().install()
+    if chrome_ver:
+        try:
+            with open(DRIVER_CACHE_PATH, "w", encoding="utf-8") as fh:
+                json.dump({"chrome": chrome_ver, "path": path}, fh)
+        except OSError:
+            pass
+    return path
+
 def build_driver():
     ensure_debug_chrome()
     opts = Options()
@@ -159,12 +243,45 @@ def build_driver():
     opts.add_argument("--lang=en-US,en")
     # No anti-bot switches; attach to real Chrome:
     opts.debugger_address = f"127.0.0.1:{CHROME_DEBUG_PORT}"
+    # Page lifecycle events (networkIdle) come back through the performance log
+    opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    opts.add_experimental_option("perfLoggingPrefs", {"enableNetwork": False, "enablePage": True})
     print(f"[attach] Connecting to Chrome at {opts.debugger_address}")
-    drv = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=opts)
+    drv = webdriver.Chrome(service=Service(_driver_path()), options=opts)
     drv.set_page_load_timeout(90)
     drv.implicitly_wait(0)
+    try:
+        drv.execute_cdp_cmd("Page.enable", {})
+        drv.execute_cdp_cmd("Page.setLifecycleEventsEnabled", {"enabled": True})
+        LIFECYCLE["frame"] = drv.execute_cdp_cmd("Page.getFrameTree", {})["frameTree"]["frame"]["id"]
+    except Exception:
+        pass  # no lifecycle events; until_ready falls back to polling for tiles
     return drv
 
+# Main-frame load state, folded in from the performance log: "init" starts a new document,
+# "networkIdle" fires once it has had no requests in flight for 500ms
+LIFECYCLE = {"frame": "", "idle": False}
+
+def network_idle(_=None) -> bool:
+    if not LIFECYCLE["frame"]:
+        return False
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return False
+    for entry in entries:
+        msg = json.loads(entry["message"])["message"]
+        if msg.get("method") != "Page.lifecycleEvent":
+            continue
+        params = msg.get("params") or {}
+        if params.get("frameId") != LIFECYCLE["frame"]:
+            continue
+        if params.get("name") == "init":
+            LIFECYCLE["idle"] = False
+        elif params.get("name") == "networkIdle":
+            LIFECYCLE["idle"] = True
+    return LIFECYCLE["idle"]
+
 driver = build_driver()
 
 # -------------------------------
@@ -172,59 +289,108 @@ driver = build_driver()
 # -------------------------------
 def robust_get(url: str) -> bool:
     try:
-        driver.get(url); time.sleep(PAGE_PAUSE); return True
+        driver.get(url); return True  # get() blocks until load; callers wait for tiles
     except WebDriverException as exc:
         sheet_log("WARN","nav",str(exc))
         return False
 
+def wait_for(cond, timeout: float, poll: float = 0.1) -> bool:
+    """Poll cond() until truthy or timeout; returns as soon as it holds."""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll).until(lambda _: cond())
+        return True
+    except TimeoutException:
+        return False
+
+TILE_BUTTON_CSS = "button[data-testid='merchantOfferListAddButton']"
+TILE_TEXT_XPATH = "//*[contains(.,'Expires') or @data-testid='expirationDate']"
+
+# Both checks as one CDP Runtime.evaluate – skips the WebDriver command layer on every poll
+_TILES_PRESENT_EXPR = (
+    f"!!document.querySelector({json.dumps(TILE_BUTTON_CSS)}) || "
+    f"!!document.evaluate({json.dumps(TILE_TEXT_XPATH)}, document, null, "
+    "XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue"
+)
+
 def offers_tiles_present() -> bool:
     try:
-        if driver.find_elements(By.CSS_SELECTOR, "button[data-testid='merchantOfferListAddButton']"):
+        res = driver.execute_cdp_cmd("Runtime.evaluate", {"expression": _TILES_PRESENT_EXPR, "returnByValue": True})
+        return bool(res.get("result", {}).get("value"))
+    except Exception:
+        pass
+    try:
+        if driver.find_elements(By.CSS_SELECTOR, TILE_BUTTON_CSS):
             return True
-        if driver.find_elements(By.XPATH, "//*[contains(.,'Expires') or @data-testid='expirationDate']"):
+        if driver.find_elements(By.XPATH, TILE_TEXT_XPATH):
             return True
     except Exception:
         pass
     return False
 
+# Lazy images are switched to eager, then the page is stepped through in-page, two animation
+# frames per SCROLL_STEP so scroll-triggered tiles still see every band of the page
+# (capped at 50ms, since a background tab doesn't run animation frames).
+_SCROLL_FULL_JS = """
+const done = arguments[arguments.length - 1], step = arguments[0];
+document.querySelectorAll("img[loading='lazy']").forEach(img => { img.loading = 'eager'; });
+const frame = () => new Promise(r => {
+  requestAnimationFrame(() => requestAnimationFrame(r));
+  setTimeout(r, 50);
+});
+const height = () => Math.max(document.body.scrollHeight, document.documentElement.scrollHeight);
+(async () => {
+  for (let y = 0, n = 0; y < height() + 400 && n < 300; y += step, n++) {
+    window.scrollTo(0, y);
+    await frame();
+  }
+  window.scrollTo(0, 0);
+  await frame();
+})().then(() => done(true), () => done(false));
+"""
+
 def gentle_scroll_full():
     try:
-        h = driver.execute_script("return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight);")
-        y = 0
-        while y < h + 400:
-            driver.execute_script("window.scrollTo(0, arguments[0]);", y)
-            time.sleep(SCROLL_DELAY + random.uniform(0.01,0.03))
-            y += SCROLL_STEP
-        driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(0.2)
+        driver.execute_async_script(_SCROLL_FULL_JS, SCROLL_STEP)
     except Exception:
         pass
 
+# One explicit wait shared by every "are the offers up yet?" check
+READY_WAIT = WebDriverWait(driver, 15, poll_frequency=0.1)
+
+def until_ready(*also, idle: bool = True) -> bool:
+    """Up to 15s for offer tiles, the page going network-idle, or any extra condition in `also`."""
+    conds = (lambda _: offers_tiles_present(),) + ((network_idle,) if idle else ()) + also
+    if idle:
+        # Only a networkIdle that arrives during this wait counts: SPA route changes fire
+        # no new "init", so an idle latched on an earlier document would pass instantly
+        network_idle()
+        LIFECYCLE["idle"] = False
+    try:
+        READY_WAIT.until(EC.any_of(*conds))
+        return True
+    except TimeoutException:
+        return False
+
 def wait_until_offers_ready():
     print("Log in in the attached Chrome and finish MFA. I’ll begin on the Offers page.")
-    last_nav = 0.0
+    navigated_once = False
     while True:
         try:
             url = (driver.current_url or "").split("#")[0].lower()
 
             if url.startswith(OFFERS_KEY.lower()):
-                t0 = time.time()
-                while time.time() - t0 < 15:
-                    if offers_tiles_present(): return
-                    time.sleep(0.3)
+                if until_ready(): return
 
             if url.startswith(OVERVIEW.lower()) or url.startswith(DASHBOARD.lower()):
-                if time.time() - last_nav > 2.5:
-                    last_nav = time.time()
+                # Send them to Offers once; after that, leave the browser to the user
+                if not navigated_once:
+                    navigated_once = True
                     robust_get(OFFERS_ROOT)
 
             if url.startswith(OFFERS_ROOT.lower()) and not url.startswith(OFFERS_KEY.lower()):
-                t1 = time.time()
-                while time.time() - t1 < 15:
-                    u = (driver.current_url or "").lower()
-                    if u.startswith(OFFERS_KEY.lower()) or offers_tiles_present():
-                        return
-                    time.sleep(0.3)
+                # Idle alone doesn't count here: the redirect to a card may still be coming
+                if until_ready(EC.url_contains("account_key="), idle=False):
+                    return
 
             time.sleep(0.3)
         except WebDriverException:
@@ -233,145 +399,163 @@ def wait_until_offers_ready():
 # -------------------------------
 # Parsing helpers (robust to layout changes)
 # -------------------------------
-MONEY_RE = r"\$[\d,]+(?:\.\d{2})?"
+MONEY = r"\$[\d,]+(?:\.\d{2})?"
+
+# Compiled once; these run for every tile/line
+MONEY_RE      = re.compile(MONEY)
+EXP_PREFIX_RE = re.compile(r"Expires[, ]+(.+)$", re.I)
+MONTH_DATE_RE = re.compile(r"(([A-Za-z]{3,9})\s+\d{1,2},\s*(\d{2,4}))")
+NUM_DATE_RE = re.compile(r"\d{1,2}/\d{1,2}/(\d{4}|\d{2})")
+SPEND_RE      = re.compile(rf"Spend\s*({MONEY})", re.I)
+EARN_RE       = re.compile(rf"(?:earn|get)\s*((?:\d{{1,3}}%|{MONEY}))\s*back", re.I)
+PCT_BACK_RE   = re.compile(r"(\d{1,3}%\s*(?:cash\s*)?back)", re.I)
+MONEY_BACK_RE = re.compile(rf"({MONEY})\s*back", re.I)
+TOTAL_RE      = re.compile(rf"total of\s*({MONEY})", re.I)
+BRAND_SKIP_RE = re.compile(r"^Expires\b|^Spend\b|^Earn\b|View Details|Terms apply", re.I)
+OFFER_WORD_RE = re.compile(r"back|spend|earn|total|expires", re.I)
+DESC_LINE_RE  = re.compile(r"\bSpend\b|\bEarn\b|\bback\b", re.I)
+EXPIRES_RE    = re.compile(r"Expires\s+([A-Za-z]{3,9}\s+\d{1,2},\s*\d{2,4}|\d{1,2}/\d{1,2}/\d{2,4})", re.I)
+CARD_MATCH_RE = re.compile(r"([A-Za-z0-9 &'’\-]+)\s*\n?[\u2022•\*]{3,}\s*(\d{4,5})")
+LAST4_RE      = re.compile(r"[\u2022•\*]+\s*(\d{4,5})")
+
+def _reformat(text: str, fmt: str) -> str:
+    try:
+        return datetime.strptime(text, fmt).strftime("%b %d, %Y")
+    except ValueError:
+        return ""
 
+@lru_cache(maxsize=2048)  # the same expirations come back every refresh round
 def normalize_exp(raw: str) -> str:
+    # Pick the one format the text can be in, so strptime only raises on real garbage
     raw = (raw or "").strip()
-    for fmt in ("%m/%d/%Y", "%m/%d/%y"):
-        try:
-            return datetime.strptime(raw, fmt).strftime("%b %d, %Y")
-        except Exception:
-            pass
-    m = re.search(r"Expires[, ]+(.+)$", raw, re.I)
+    m = NUM_DATE_RE.fullmatch(raw)
     if m:
-        return normalize_exp(m.group(1))
-    m = re.search(r"([A-Za-z]{3,9}\s+\d{1,2},\s*\d{2,4})", raw)
+        return _reformat(raw, "%m/%d/%Y" if len(m.group(1)) == 4 else "%m/%d/%y") or raw
+    m = EXP_PREFIX_RE.search(raw)
     if m:
-        for fmt in ("%b %d, %Y", "%B %d, %Y", "%b %d, %y", "%B %d, %y"):
-            try:
-                return datetime.strptime(m.group(1), fmt).strftime("%b %d, %Y")
-            except Exception:
-                pass
+        return normalize_exp(m.group(1))
+    m = MONTH_DATE_RE.search(raw)
+    if m and len(m.group(3)) in (2, 4):
+        fmt = ("%b" if len(m.group(2)) == 3 else "%B") + (" %d, %Y" if len(m.group(3)) == 4 else " %d, %y")
+        return _reformat(m.group(1), fmt) or raw
     return raw
 
 def parse_from_desc(desc: str) -> tuple:
     desc = desc or ""
-    m = re.search(r"Spend\s*(" + MONEY_RE + ")", desc, re.I)
+    m = SPEND_RE.search(desc)
     min_spend = m.group(1) if m else "None"
-    m = re.search(r"(?:earn|get)\s*((?:\d{1,3}%|" + MONEY_RE + r"))\s*back", desc, re.I)
-    if not m: m = re.search(r"(\d{1,3}%\s*(?:cash\s*)?back)", desc, re.I)
-    if not m: m = re.search(r"(" + MONEY_RE + r")\s*back", desc, re.I)
+    m = EARN_RE.search(desc)
+    if not m: m = PCT_BACK_RE.search(desc)
+    if not m: m = MONEY_BACK_RE.search(desc)
     discount = (f"{m.group(1)} back" if m and "%" not in m.group(1) else (m.group(1) if m else "Unknown"))
-    m = re.search(r"total of\s*(" + MONEY_RE + ")", desc, re.I)
+    m = TOTAL_RE.search(desc)
     max_total = m.group(1) if m else ""
     return discount, min_spend, max_total
 
 def infer_brand_from_text(txt: str) -> str:
     lines = [l.strip() for l in (txt or "").splitlines() if l.strip()]
     for l in lines[:6]:
-        if re.search(r"^Expires\b|^Spend\b|^Earn\b|View Details|Terms apply", l, re.I):
+        if BRAND_SKIP_RE.search(l):
             continue
-        if re.search(MONEY_RE, l) and re.search(r"back|spend|earn|total|expires", l, re.I):
+        if MONEY_RE.search(l) and OFFER_WORD_RE.search(l):
             continue
         return l
     return "Unknown Brand"
 
-def tile_root_from_button(btn):
-    node = btn
-    for _ in range(8):
-        try:
-            parent = node.find_element(By.XPATH, "./..")
-        except Exception:
-            break
-        node = parent
-        try:
-            block_text = node.text or ""
-        except Exception:
-            block_text = ""
-        if re.search(r"View Details|Terms apply|Expires", block_text, re.I):
-            return node
-    return btn
-
-def extract_tile_data(tile) -> tuple:
-    brand = "Unknown Brand"
-    try:
-        brand = tile.find_element(By.XPATH, ".//h3//span").text.strip() or brand
-    except Exception:
-        pass
-    try:
-        txt = tile.text or ""
-    except Exception:
-        txt = ""
+def parse_tile(brand_text: str, txt: str, exp_text: str) -> tuple:
+    brand = (brand_text or "").strip() or "Unknown Brand"
+    txt = txt or ""
     if brand == "Unknown Brand":
         brand = infer_brand_from_text(txt)
-    desc = ""
-    for line in sorted([l.strip() for l in txt.splitlines()], key=len, reverse=True):
-        if re.search(r"\bSpend\b|\bEarn\b|\bback\b", line, re.I):
-            desc = line
-            break
+    # Longest Spend/Earn/back line, first one on ties – one pass, no sort
+    desc = max((l for l in (ln.strip() for ln in txt.splitlines()) if DESC_LINE_RE.search(l)), key=len, default="")
     discount, min_spend, max_total = parse_from_desc(desc)
-    exp = ""
-    try:
-        t = tile.find_element(By.CSS_SELECTOR, "[data-testid='expirationDate']").text.strip()
-        if t: exp = normalize_exp(t)
-    except Exception:
-        pass
+    exp = normalize_exp(exp_text.strip()) if (exp_text or "").strip() else ""
     if not exp:
-        m = re.search(r"Expires\s+([A-Za-z]{3,9}\s+\d{1,2},\s*\d{2,4}|\d{1,2}/\d{1,2}/\d{2,4})", txt, re.I)
+        m = EXPIRES_RE.search(txt)
         if m: exp = normalize_exp(m.group(1))
     return brand, discount, min_spend, max_total, exp
 
 # -------------------------------
 # Card info
 # -------------------------------
+# (card name, last4) per account_key – refresh rounds stay on the same card
+CARD_INFO: dict = {}
+
 def current_card_info() -> Tuple[str, str]:
+    try:
+        url = driver.current_url or ""
+    except Exception:
+        url = ""
+    key = url.split("account_key=", 1)[1].split("&")[0].split("#")[0] if "account_key=" in url else ""
+    if key in CARD_INFO:
+        return CARD_INFO[key]
     name, last4 = "Amex Card", "XXXX"
     try:
         body = driver.find_element(By.TAG_NAME, "body").text
-        m = re.search(r"([A-Za-z0-9 &'’\-]+)\s*\n?[\u2022•\*]{3,}\s*(\d{4,5})", body)
+        m = CARD_MATCH_RE.search(body)
         if m:
             name = m.group(1).strip()
             last4 = m.group(2)[-4:]
         else:
-            m4 = re.search(r"[\u2022•\*]+\s*(\d{4,5})", body)
+            m4 = LAST4_RE.search(body)
             if m4:
                 last4 = m4.group(1)[-4:]
     except Exception:
         pass
+    if key and last4 != "XXXX":  # don't pin a miss; the next pass reads the page again
+        CARD_INFO[key] = (name, last4)
     return name, last4
 
 # -------------------------------
 # Adding loop
 # -------------------------------
-def plus_buttons_snapshot() -> List:
+ADD_BUTTON_CSS = "button[data-testid='merchantOfferListAddButton']:not([data-processed='1'])"
+
+# Every visible, unprocessed add button with its tile's raw fields, in one round-trip.
+# The tile is the nearest of 8 ancestors whose text looks like an offer card; the walk
+# tests textContent (no layout) and is remembered per button in a WeakMap across passes.
+_TILES_JS = """
+const tileOf = window.__amexTileOf || (window.__amexTileOf = new WeakMap());
+const out = [];
+for (const b of document.querySelectorAll(arguments[0])) {
+  const r = b.getBoundingClientRect();
+  if (!(r.width > 0 && r.height > 0)) continue;
+  let tile = tileOf.get(b);
+  if (!tile || !tile.isConnected) {
+    tile = b;
+    for (let node = b, i = 0; i < 8 && node.parentElement; i++) {
+      node = node.parentElement;
+      if (/View Details|Terms apply|Expires/i.test(node.textContent || '')) { tile = node; break; }
+    }
+    tileOf.set(b, tile);
+  }
+  const brandEl = tile.querySelector('h3 span'), expEl = tile.querySelector("[data-testid='expirationDate']");
+  out.push({btn: b, tile: tile, brand: brandEl ? brandEl.innerText : '',
+            text: tile.innerText || '', exp: expEl ? expEl.innerText : ''});
+}
+return out;
+"""
+
+def tiles_snapshot() -> List[dict]:
     try:
-        btns = driver.find_elements(By.CSS_SELECTOR, "button[data-testid='merchantOfferListAddButton']:not([data-processed='1'])")
-        if not btns:
-            btns = driver.find_elements(
-                By.XPATH,
-                "//button[.//*[name()='svg']//*[name()='path' and "
-                "((contains(@d,'v-19') and contains(@d,'h-19')) or contains(@d,'-19v-19')) and "
-                "not(@data-processed='1')]"
-            )
-        return [b for b in btns if b.is_displayed()]
+        return driver.execute_script(_TILES_JS, ADD_BUTTON_CSS) or []
     except Exception:
         return []
 
 def wait_added_visual(tile, btn, timeout: float = 3.0) -> bool:
-    end = time.time() + timeout
-    while time.time() < end:
+    """Checkmark path in the tile, or the button gone/hidden; polled every 50ms."""
+    def added() -> bool:
         try:
             if tile.find_elements(By.XPATH, ".//*[name()='path' and (@fill-rule='evenodd' or @clip-rule='evenodd')]"):
                 return True
         except Exception:
             pass
         try:
-            if not btn.is_displayed():
-                return True
+            return not btn.is_displayed()
         except Exception:
             return True
-        time.sleep(0.15)
-    return False
+    return wait_for(added, timeout, poll=0.05)
 
 def expand_more_if_present():
     xps = [
@@ -403,8 +587,9 @@ def add_all_offers_for_current_card(holder: str) -> int:
     added_count = 0
 
     while True:
-        btns = plus_buttons_snapshot()
-        if not btns:
+        tiles = tiles_snapshot()
+        if not tiles:
+            # One expand + scroll retry, then we're done with this pass
             idle_rounds += 1
             if idle_rounds >= 2:
                 break
@@ -414,48 +599,49 @@ def add_all_offers_for_current_card(holder: str) -> int:
             continue
 
         idle_rounds = 0
-        btn = btns[0]
-        tile = tile_root_from_button(btn)
-        brand, discount, min_spend, max_total, exp = extract_tile_data(tile)
+        # Work the whole snapshot; only click/wait/hide still go through Selenium per tile
+        for t in tiles:
+            btn, tile = t["btn"], t["tile"]
+            brand, discount, min_spend, max_total, exp = parse_tile(t.get("brand"), t.get("text"), t.get("exp"))
 
-        try:
-            driver.execute_script("arguments[0].scrollIntoView({block:'center'});", btn)
-            time.sleep(SMALL_PAUSE + random.uniform(0.03, 0.08))
-            btn.click()
-            time.sleep(CLICK_PAUSE + random.uniform(0.03, 0.08))
-            wait_added_visual(tile, btn, timeout=3.0)
-        except Exception as exc:
-            sheet_log("WARN", "click_add", f"{type(exc).__name__}")
-
-        try:
-            driver.execute_script("arguments[0].setAttribute('data-processed','1'); arguments[0].style.display='none';", btn)
-        except Exception:
-            pass
+            try:
+                driver.execute_script("arguments[0].scrollIntoView({block:'center'});", btn)
+                btn.click()
+                wait_added_visual(tile, btn, timeout=3.0)
+            except StaleElementReferenceException:
+                break  # list re-rendered under us; take a fresh snapshot
+            except Exception as exc:
+                sheet_log("WARN", "click_add", f"{type(exc).__name__}")
 
-        APPEND_BUFFER.append([
-            holder,
-            last4,
-            card_name,
-            brand or "Unknown Brand",
-            discount or "Unknown",
-            (max_total or ""),
-            (min_spend or "None"),
-            today,
-            (exp or ""),
-            "No"
-        ])
-        added_count += 1
-
-        if len(APPEND_BUFFER) >= MICRO_BATCH:
-            flush_buffer()
+            try:
+                driver.execute_script("arguments[0].setAttribute('data-processed','1'); arguments[0].style.display='none';", btn)
+            except Exception:
+                pass
 
-        safety_clicks += 1
+            APPEND_BUFFER.append([
+                holder,
+                last4,
+                card_name,
+                brand or "Unknown Brand",
+                discount or "Unknown",
+                (max_total or ""),
+                (min_spend or "None"),
+                today,
+                (exp or ""),
+                "No"
+            ])
+            added_count += 1
+
+            if len(APPEND_BUFFER) >= MICRO_BATCH:
+                flush_buffer()
+
+            safety_clicks += 1
+            if safety_clicks > 800:
+                break
         if safety_clicks > 800:
             sheet_log("WARN", "add_loop", "safety break")
             break
 
-        time.sleep(0.12 + random.uniform(0.02, 0.06))
-
     return added_count
 
 # -------------------------------
@@ -468,11 +654,7 @@ def main():
         print("When I detect Offers, I’ll start adding and logging rows.")
 
         wait_until_offers_ready()
-
-        t0 = time.time()
-        while time.time() - t0 < 15:
-            if offers_tiles_present(): break
-            time.sleep(0.3)
+        until_ready()
 
         # ---- First pass
         total_added = add_all_offers_for_current_card(AMEX_HOLDER)
@@ -488,19 +670,15 @@ def main():
             time.sleep(1.5)
 
             # wait until tiles are present again
-            t1 = time.time()
-            while time.time() - t1 < 15:
-                if offers_tiles_present():
-                    break
-                time.sleep(0.3)
+            until_ready()
 
             added = add_all_offers_for_current_card(AMEX_HOLDER)
             flush_buffer()
             total_added = added  # if zero on a round, we’ll break next loop
 
-        removed = dedupe_rows()
+        UPLOAD_Q.join()  # dedupe must see every appended row
+        removed = dedupe_and_reset_filters()
         if removed: print(f"Removed {removed} duplicate row(s).")
-        reset_filters()
         print("Done.")
     except (InvalidSessionIdException, WebDriverException) as exc:
         print(f"Browser session ended: {exc}")
@@ -510,6 +688,8 @@ def main():
         sheet_log("ERROR","main",f"Fatal: {type(exc).__name__}: {exc}")
     finally:
         flush_buffer()
+        UPLOAD_Q.join()
+        flush_log_buffer()
         if AUTO_CLOSE:
             try: driver.quit()
             except Exception: pass
@@ -9,27 +9,42 @@
 #   GOOGLE_SHEET_KEY=13M4YcJ5vPq4VEeNg1KOmE0QRyRVs9EDrroy66jH6iCs
 #   (optional) WINDOW_OFFSET=3440,0
 #   (optional) CLOSE_ON_EXIT=false
+#   (optional) CHASE_BLOCK_ASSETS=1   (skip images/fonts/analytics via CDP)
+#   (optional) CHASE_COOKIE_MAX_AGE=600   (seconds a saved login is reused)
+#   (optional) CHASE_STEALTH=1   (type login fields one key at a time)
+#   (optional) CHASE_CARD_CACHE_HOURS=6   (skip cards with nothing to add; 0=off)
+#   (optional) CHASE_PAGE_LOAD_STRATEGY=none   (don't wait for DOMContentLoaded; default eager)
+#   (optional) COALESCE_CARDS=false   (append + re-filter after every card instead of once)
 # ---------------------------------------------------------------------------
 
+import atexit
+import hashlib
+import json
 import os
+import pickle
 import re
+import signal
 import sys
 import time
 from datetime import datetime, timedelta, date
-from typing import List, Set, Tuple, Optional
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple, Optional
 
 import gspread
+from gspread.utils import rowcol_to_a1
 from dotenv import load_dotenv
 from google.oauth2.service_account import Credentials
 
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException, InvalidSessionIdException
+from selenium.common.exceptions import WebDriverException, InvalidSessionIdException, TimeoutException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
+from webdriver_manager.core.os_manager import ChromeType, OperationSystemManager
 
 # -------------------------------
 # Config & env
@@ -71,24 +86,52 @@ CHASE_2FA_FRAGMENT = "recognizeUser/provideAuthenticationCode"
 # Timing
 POLL_TICK        = float(os.getenv("CHASE_POLL_TICK", "0.06"))
 PAGE_LOAD_PAUSE  = float(os.getenv("CHASE_PAGE_LOAD_PAUSE", "0.60"))
-FAST_CLICK_DELAY = float(os.getenv("FAST_CLICK_DELAY", "0.25"))
 FAST_BACK_WAIT   = float(os.getenv("FAST_BACK_WAIT", "0.25"))
-FAST_BETWEEN     = float(os.getenv("FAST_BETWEEN", "0.25"))
 CARD_LOAD_PAUSE  = float(os.getenv("CARD_LOAD_PAUSE", "1.4"))
 LOGIN_WAIT_MAX   = int(os.getenv("CHASE_LOGIN_WAIT_MAX", "420"))
+STEALTH_TYPING   = os.getenv("CHASE_STEALTH", "0").strip() == "1"
+PAGE_LOAD_STRATEGY = os.getenv("CHASE_PAGE_LOAD_STRATEGY", "eager").strip().lower()
+
+# Session reuse (cookies from the last successful login)
+COOKIE_PATH    = os.path.join(PROJECT_ROOT, "chase_cookies.pkl")
+COOKIE_MAX_AGE = int(os.getenv("CHASE_COOKIE_MAX_AGE", "600"))
+
+# Cards that had no add buttons on a recent run (accountId -> epoch seconds)
+CARD_SCAN_PATH   = os.path.join(PROJECT_ROOT, "chase_card_scans.json")
+CARD_CACHE_HOURS = float(os.getenv("CHASE_CARD_CACHE_HOURS", "6"))
 
 # Window behavior
 CLOSE_ON_EXIT = os.getenv("CLOSE_ON_EXIT", "false").lower() == "true"
 SECOND_MONITOR_OFFSET = tuple(int(x) for x in os.getenv("WINDOW_OFFSET", "3440,0").split(","))
 
+# Network
+BLOCK_ASSETS = os.getenv("CHASE_BLOCK_ASSETS", "0").strip() == "1"
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.woff", "*.woff2",
+    "*adobedtm*", "*qualtrics*", "*googletagmanager*", "*demdex*",
+]
+
 # 2FA guards (module-level so they persist)
 _TWOFA_PASSWORD_DONE = False
 _TWOFA_LAST_ATTEMPT = 0.0
 
 # Sheets buffers
 APPEND_BUFFER: List[List[str]] = []
-CURRENT_CARD_BUFFER: List[List[str]] = []
+BUFFER_KEYS: Set[int] = set()  # row_key of every row waiting in APPEND_BUFFER
 APPEND_CHUNK_SIZE = int(os.getenv("APPEND_CHUNK_SIZE", "400"))
+LOG_BUFFER: List[List[str]] = []
+LOG_CHUNK_SIZE = int(os.getenv("LOG_CHUNK_SIZE", "25"))
+# Hold rows across cards and append once at the end of the run; false = flush per card (debugging)
+COALESCE_CARDS = os.getenv("COALESCE_CARDS", "true").lower() == "true"
+
+# In-run memory of finished accountIds (no need to revisit)
+FINISHED_ACCOUNTS: Set[str] = set()
+
+# Rows on the offers tab incl. header, kept in step with appends/deletes (0 = not read yet)
+ROW_COUNT = 0
+
+# "Date Added" for new rows; refreshed at each card start so a run past midnight rolls over
+TODAY_STR = datetime.today().strftime("%b %d, %Y")
 
 # -------------------------------
 # Sheets bootstrap
@@ -103,38 +146,115 @@ OFFER_HEADERS = (
     "Date Added", "Expiration", "Local"
 )
 
+LOG_HEADERS = ("Time", "Level", "Function", "Message")
+
+def _sheet_index(sheet, titles: Tuple[str, ...]) -> Dict[str, Tuple[gspread.Worksheet, Optional[List[str]]]]:
+    """One spreadsheets.get returning every worksheet plus row 1 of the tabs we use."""
+    try:
+        meta = sheet.fetch_sheet_metadata(params={
+            "includeGridData": "true",
+            "ranges": [f"'{t}'!1:1" for t in titles],
+            "fields": "sheets(properties,data.rowData.values.formattedValue)",
+        })
+    except gspread.exceptions.APIError:
+        # A missing tab makes its range invalid – fall back to plain metadata
+        meta = sheet.fetch_sheet_metadata()
+    index = {}
+    for s in meta.get("sheets", []):
+        ws = gspread.Worksheet(sheet, s["properties"], sheet.id, sheet.client)
+        header = None  # unknown -> read it lazily
+        if "data" in s:
+            rows = (s["data"][0] if s["data"] else {}).get("rowData") or [{}]
+            header = [c.get("formattedValue", "") for c in rows[0].get("values", [])]
+            while header and not header[-1]:
+                header.pop()
+        index[ws.title] = (ws, header)
+    return index
+
 def _ws(sheet, title: str, headers: Tuple[str, ...]):
-    existing = {w.title: w for w in sheet.worksheets()}
-    ws = existing.get(title) or sheet.add_worksheet(title=title, rows=5000, cols=len(headers))
-    row1 = ws.row_values(1)
+    ws, row1 = _WS_CACHE.get(title) or (sheet.add_worksheet(title=title, rows=5000, cols=len(headers)), [])
+    if row1 is None:
+        row1 = ws.row_values(1)
     if row1 != list(headers):
-        if not row1:
-            ws.append_row(list(headers), value_input_option="RAW")
-        else:
-            ws.update("1:1", [headers], value_input_option="RAW")
+        ws.update("1:1", [headers], value_input_option="RAW")
+    _WS_CACHE[title] = (ws, list(headers))  # later lookups skip both the API and the header check
     return ws
 
+_WS_CACHE = _sheet_index(SHEET, ("Card Offers", "Log"))
 OFFER_WS = _ws(SHEET, "Card Offers", OFFER_HEADERS)
-LOG_WS   = _ws(SHEET, "Log", ("Time", "Level", "Function", "Message"))
+LOG_WS   = _ws(SHEET, "Log", LOG_HEADERS)
+
+# Fixed for the run; used by every filter/delete request
+SHEET_ID = OFFER_WS.id
+LAST_COL = len(OFFER_HEADERS)
 
 def sheet_log(level: str, func: str, msg: str):
+    """Buffer a log line; written in one append_rows every LOG_CHUNK_SIZE entries."""
+    LOG_BUFFER.append([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), level, func, msg])
+    if len(LOG_BUFFER) >= LOG_CHUNK_SIZE:
+        flush_log_buffer()
+
+def flush_log_buffer():
+    global LOG_BUFFER
+    if not LOG_BUFFER:
+        return
     try:
-        LOG_WS.append_row(
-            [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), level, func, msg],
-            value_input_option="RAW", insert_data_option="INSERT_ROWS"
-        )
+        LOG_WS.append_rows(LOG_BUFFER, value_input_option="RAW", insert_data_option="INSERT_ROWS")
     except Exception as exc:
-        print(f"(Sheets log failed) {level} {func}: {msg} – {exc}")
+        for level, func, msg in (r[1:] for r in LOG_BUFFER):
+            print(f"(Sheets log failed) {level} {func}: {msg} – {exc}")
+    finally:
+        LOG_BUFFER = []
 
 # -------------------------------
 # Driver
 # -------------------------------
+DRIVER_CACHE_PATH = os.path.join(PROJECT_ROOT, ".chromedriver.json")
+
+def _driver_path() -> str:
+    """
+    ChromeDriverManager().install() checks the network for a matching driver on
+    every call. Cache the resolved path keyed on the installed Chrome version and
+    only reinstall when Chrome updates.
+    """
+    try:
+        chrome_ver = OperationSystemManager().get_browser_version_from_os(ChromeType.GOOGLE) or ""
+    except Exception:
+        chrome_ver = ""
+    try:
+        with open(DRIVER_CACHE_PATH, encoding="utf-8") as fh:
+            cached = json.load(fh)
+        if chrome_ver and cached.get("chrome") == chrome_ver and os.path.isfile(cached.get("path", "")):
+            return cached["path"]
+    except (OSError, ValueError):
+        pass
+    path = ChromeDriverManager().install()
+    if chrome_ver:
+        try:
+            with open(DRIVER_CACHE_PATH, "w", encoding="utf-8") as fh:
+                json.dump({"chrome": chrome_ver, "path": path}, fh)
+        except OSError:
+            pass
+    return path
+
 def build_driver() -> Tuple[webdriver.Chrome, WebDriverWait]:
     opts = Options()
     opts.add_argument("--start-maximized")
     opts.add_experimental_option("excludeSwitches", ["enable-automation"])
     opts.add_experimental_option("useAutomationExtension", False)
-    drv = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=opts)
+    # Return from get()/back() early ("eager" = DOMContentLoaded, "none" = right away);
+    # readiness is checked with explicit waits
+    opts.page_load_strategy = PAGE_LOAD_STRATEGY if PAGE_LOAD_STRATEGY in ("eager", "none") else "eager"
+    # One persistent HTTP connection to chromedriver; commands are issued serially, so the
+    # default pool of 1 never blocks
+    drv = webdriver.Chrome(service=Service(_driver_path()), options=opts, keep_alive=True)
+    if BLOCK_ASSETS:
+        try:
+            drv.execute_cdp_cmd("Network.enable", {})
+            drv.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+            print("[driver] blocking images/fonts/analytics.")
+        except Exception as exc:
+            print(f"[driver] asset blocking unavailable: {exc}")
     try:
         drv.set_window_position(*SECOND_MONITOR_OFFSET)
     except Exception:
@@ -177,12 +297,31 @@ def on_dashboard() -> bool:
     u = driver.current_url or ""
     return u.startswith(CHASE_POST_LOGIN)
 
+# Native value setter so React sees the change, then the events it listens for
+_SET_VALUE_JS = """
+const el = arguments[0];
+el.focus();
+Object.getOwnPropertyDescriptor(window.HTMLInputElement.prototype, 'value').set.call(el, arguments[1]);
+el.dispatchEvent(new Event('input', {bubbles: true}));
+el.dispatchEvent(new Event('change', {bubbles: true}));
+"""
+
 def type_like_human(el, text: str, total_seconds: float = 2.0):
-    """Click then type one char at a time over ~total_seconds."""
+    """
+    Fill a field in one JS call. With CHASE_STEALTH=1, click then type one
+    char at a time over ~total_seconds instead.
+    """
     try:
         driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
     except Exception:
         pass
+    if not STEALTH_TYPING:
+        try:
+            driver.execute_script(_SET_VALUE_JS, el, text)
+            return
+        except Exception:
+            el.send_keys(text)
+            return
     try:
         el.click()
     except Exception:
@@ -197,6 +336,12 @@ def type_like_human(el, text: str, total_seconds: float = 2.0):
 # -------------------------------
 def prefill_home_login(username: str, password: str):
     """Prefill user + pass on the chase.com home login widget."""
+    # get() may return before the widget renders (eager/none), so wait for the field itself
+    try:
+        _present("#userId-text-input-field, input[data-validate='userId'], input[name='userId']", timeout=30.0)
+    except TimeoutException:
+        print("[login] Username field not found after 30s; trying anyway.")
+
     # Username
     for by, val in [
         (By.ID, "userId-text-input-field"),
@@ -311,61 +456,144 @@ def maybe_fill_password_on_2fa(password: str):
         print(f"[2FA] Could not fill password: {type(e).__name__}")
 
 def wait_for_post_login(timeout: int = LOGIN_WAIT_MAX) -> bool:
-    end = time.time() + timeout
-    while time.time() < end:
+    def _logged_in(_) -> bool:
         if on_dashboard():
-            print(f"[login] Post-login detected: {driver.current_url}")
             return True
         maybe_fill_password_on_2fa(P1)
-        time.sleep(0.5)
-    sheet_log("ERROR", "wait", "Timed out waiting for post-login.")
-    return False
+        return False
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.25).until(_logged_in)
+    except TimeoutException:
+        sheet_log("ERROR", "wait", "Timed out waiting for post-login.")
+        return False
+    print(f"[login] Post-login detected: {driver.current_url}")
+    return True
+
+def save_session_cookies():
+    try:
+        with open(COOKIE_PATH, "wb") as fh:
+            pickle.dump(driver.get_cookies(), fh)
+    except Exception as exc:
+        print(f"[session] could not save cookies: {exc}")
+
+DASHBOARD_READY_XPATHS = (
+    "//*[starts-with(@data-testid,'accountTile') or starts-with(@id,'accountTile')]",
+    "//*[self::a or self::button or self::mds-button][@id='brand_bar_sign_in_out' or "
+    "contains(translate(normalize-space(.),'SIGNOUT','signout'),'sign out')]",
+)
+
+def restore_session(timeout: float = 15.0) -> bool:
+    """Load cookies from a recent login; True only if that lands on the dashboard."""
+    try:
+        if time.time() - os.path.getmtime(COOKIE_PATH) > COOKIE_MAX_AGE:
+            return False
+        with open(COOKIE_PATH, "rb") as fh:
+            cookies = pickle.load(fh)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return False
+
+    # add_cookie only works for the current host, so open secure.chase.com first
+    if not robust_get(CHASE_POST_LOGIN, tries=1):
+        return False
+    for c in cookies:
+        try:
+            driver.add_cookie(c)
+        except Exception:
+            pass
+    if not robust_get(CHASE_POST_LOGIN, tries=1):
+        return False
+    # The dashboard URL is current before the SPA bounces a dead session to logon,
+    # so wait for something only a signed-in page renders (or for that bounce)
+    def _settled(_):
+        if "/logon" in (driver.current_url or "").lower():
+            return "logon"
+        return on_dashboard() and _any_match(DASHBOARD_READY_XPATHS)
+    if _wait_until(_settled, timeout, poll=0.25) is not True:
+        print("[session] saved cookies rejected – logging in normally.")
+        return False
+    return True
 
 # -------------------------------
 # Offer-page DOM helpers
 # -------------------------------
+# implicitly_wait stays 0: absent elements must return [] immediately. Use
+# _present() only where we actually want to block until something shows up.
+ADD_BUTTON_SELECTORS = (
+    "button[aria-label*='Add offer']",
+    "[data-testid='addOfferButton']",
+    "mds-icon[data-testid='commerce-tile-button']",
+    "button[aria-label^='Add ']",
+)
+ADD_BUTTON_CSS = ", ".join(ADD_BUTTON_SELECTORS)
+
+def _present(css: str, timeout: float = 5.0) -> list:
+    """Explicit wait for at least one match; raises TimeoutException."""
+    return WebDriverWait(driver, timeout).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, css)))
+
+def _wait_until(cond, timeout: float, poll: float = 0.1):
+    """cond's first truthy result within timeout, else False (transient driver errors are retried)."""
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=poll,
+                             ignored_exceptions=(WebDriverException,)).until(cond)
+    except TimeoutException:
+        return False
+
+HUB_SHELL_XPATHS = (
+    "//button[@id='select-select-credit-card-account' or @id='select-credit-card-account']",
+    "//*[@data-testid='select-credit-card-account' or @id='select-credit-card-account']",
+    "//*[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'chase offers')]",
+)
+CATEGORIES_SHELL_XPATHS = (
+    "//*[@data-testid='offerCategoriesPage']",
+    "//h1[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'offers for you')]",
+    "//div[contains(@class,'offer') and .//button[contains(@aria-label,'Add') or contains(.,'Add')]]",
+    "//*[@data-testid='loading-indicator' or contains(@class,'skeleton')]",
+)
+ADD_BUTTON_FALLBACK_XPATH = "//button[contains(.,'Add') and not(@disabled)]"
+
+# Optional CSS first, then XPaths in order; stops at the first hit (one round-trip per check)
+_ANY_MATCH_JS = """
+if (arguments[0] && document.querySelector(arguments[0])) return true;
+return arguments[1].some(xp => !!document.evaluate(xp, document, null,
+                                  XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue);
+"""
+
+def _any_match(xpaths, css: str = "") -> bool:
+    try:
+        return bool(driver.execute_script(_ANY_MATCH_JS, css, list(xpaths)))
+    except Exception:
+        return False
+
 def hub_shell_present() -> bool:
-    sels = [
-        "//button[@id='select-select-credit-card-account' or @id='select-credit-card-account']",
-        "//*[@data-testid='select-credit-card-account' or @id='select-credit-card-account']",
-        "//*[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'chase offers')]",
-    ]
-    for xp in sels:
-        if driver.find_elements(By.XPATH, xp):
-            return True
-    return False
+    return _any_match(HUB_SHELL_XPATHS)
 
 def categories_shell_present() -> bool:
-    sels = [
-        "//*[@data-testid='offerCategoriesPage']",
-        "//h1[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'offers for you')]",
-        "//div[contains(@class,'offer') and .//button[contains(@aria-label,'Add') or contains(.,'Add')]]",
-        "//*[@data-testid='loading-indicator' or contains(@class,'skeleton')]",
-    ]
-    for xp in sels:
-        if driver.find_elements(By.XPATH, xp):
-            return True
-    return False
+    return _any_match(CATEGORIES_SHELL_XPATHS)
+
+PAY_WITH_XPATH = "//span[starts-with(normalize-space(),'Pay with ')]"
+
+_CLICK_STATE_JS = """
+return {
+  href: location.href,
+  n: document.querySelectorAll(arguments[0]).length,
+  detail: !!document.evaluate(arguments[1], document, null,
+                              XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+};
+"""
+
+def click_state() -> dict:
+    """URL, add-button count and detail-page flag in one JS round-trip."""
+    try:
+        return driver.execute_script(_CLICK_STATE_JS, ADD_BUTTON_CSS, PAY_WITH_XPATH) or {}
+    except Exception:
+        return {}
+
+def add_buttons_count() -> int:
+    return int(click_state().get("n") or 0)
 
 def add_buttons_present() -> bool:
-    sels = [
-        "button[aria-label*='Add offer']",
-        "[data-testid='addOfferButton']",
-        "mds-icon[data-testid='commerce-tile-button']",
-        "button[aria-label^='Add ']",
-        "//button[contains(.,'Add') and not(@disabled)]",
-    ]
-    for sel in sels:
-        try:
-            if sel.startswith("//"):
-                if driver.find_elements(By.XPATH, sel):
-                    return True
-            else:
-                if driver.find_elements(By.CSS_SELECTOR, sel):
-                    return True
-        except Exception:
-            pass
-    return False
+    return _any_match((ADD_BUTTON_FALLBACK_XPATH,), css=ADD_BUTTON_CSS)
 
 # -------------------------------
 # Parsing helpers
@@ -373,6 +601,28 @@ def add_buttons_present() -> bool:
 BRAND_FALLBACK = "Unknown Brand"
 CARD_NAME_DEFAULT = "Chase Card"
 
+# Compiled once; these run for every offer
+DAYS_RE        = re.compile(r"(\d+)\s+days", re.I)
+DISCOUNT_RE    = re.compile(
+    r"(\$\d[\d,]*(?:\.\d{2})?\s*(?:cash\s*)?back|\$\d[\d,]*(?:\.\d{2})?\s*off|\d{1,3}%\s*(?:cash\s*)?back|\d{1,3}%\s*off)",
+    re.I
+)
+PAY_WITH_RE    = re.compile(r"^Pay with\s+(.*?)\s*\((?:\.\.\.)?(\d{4})\)")
+LAST4_RE       = re.compile(r"(?:ending in|ending\s*\*)\s*(?P<ending>\d{4})|\(\.\.\.(?P<paren>\d{4})\)", re.I)
+MAX_AFTER_RE   = re.compile(r"\$\s?([\d,]+(?:\.\d{2})?)\s*(?:cash\s*back\s*)?(?:maximum|max)\b", re.I)
+MAX_BEFORE_RE  = re.compile(r"[Mm]ax(?:imum)?[^$]{0,25}\$(\d[\d,]*(?:\.\d{2})?)")
+MIN_SPEND_RE   = re.compile(r"(?:spend|purchase)[^$]{0,25}\$(\d[\d,]*(?:\.\d{2})?)", re.I)
+DOLLAR_RE      = re.compile(r"\$(\d[\d,]*(?:\.\d{2})?)")
+EXPIRES_RE     = re.compile(
+    r"(?:Expires?|Offer expires|Exp\.)\s*(?:on\s*)?([A-Za-z]{3,9}\s+\d{1,2},\s*\d{2,4}|\d{1,2}/\d{1,2}/\d{2,4})",
+    re.I
+)
+EXPIRES_IN_RE  = re.compile(r"expires?\s+in\s+\d+\s+days", re.I)
+LOCAL_RE       = re.compile(r"Offer only applies to the following location", re.I)
+ADDRESS_RE     = re.compile(r"\n\d{2,5}\s+.+\n[A-Za-z\s]+,\s*[A-Z]{2}\s+\d{5}")
+NOT_BRAND_RE   = re.compile(r"cash\s*back|\$\d", re.I)
+NOT_HEADING_RE = re.compile(r"cash\s*back|\$\d|about this deal", re.I)
+
 def try_parse_date_any(s: str) -> Optional[date]:
     if not s: return None
     s = s.strip()
@@ -381,7 +631,7 @@ def try_parse_date_any(s: str) -> Optional[date]:
             return datetime.strptime(s, fmt).date()
         except Exception:
             pass
-    m = re.search(r"(\d+)\s+days", s, re.I)
+    m = DAYS_RE.search(s)
     if m:
         try:
             return (datetime.today() + timedelta(days=int(m.group(1)))).date()
@@ -393,137 +643,137 @@ def normalize_date_out(s: Optional[str]) -> str:
     d = try_parse_date_any(s or "")
     return d.strftime("%b %d, %Y") if d else ""
 
+@lru_cache(maxsize=1024)  # same tile text shows up on every card carrying that merchant
 def parse_discount_from_sources(*texts: str) -> str:
-    pat = re.compile(
-        r"(\$\d[\d,]*(?:\.\d{2})?\s*(?:cash\s*)?back|\$\d[\d,]*(?:\.\d{2})?\s*off|\d{1,3}%\s*(?:cash\s*)?back|\d{1,3}%\s*off)",
-        re.I
-    )
     for t in texts:
         if not t: continue
-        m = pat.search(t)
+        m = DISCOUNT_RE.search(t)
         if m: return m.group(1).strip()
     return ""
 
-def parse_card_and_last4_quick() -> Tuple[str, str]:
-    try:
-        el = driver.find_element(By.XPATH, "//span[starts-with(normalize-space(),'Pay with ')]")
-        txt = el.text.strip()
-        m = re.search(r"^Pay with\s+(.*?)\s*\((?:\.\.\.)?(\d{4})\)", txt)
-        if m:
-            return m.group(1).strip() + " Card", m.group(2)
-    except Exception:
-        pass
-    body = ""
-    try:
-        body = driver.find_element(By.TAG_NAME, "body").text
-    except Exception:
-        pass
-    m2 = re.search(r"(?:ending in|ending\s*\*)\s*(\d{4})", body, re.I)
-    if m2:
-        return CARD_NAME_DEFAULT, m2.group(1)
-    m3 = re.search(r"\(\.\.\.(\d{4})\)", body)
-    if m3:
-        return CARD_NAME_DEFAULT, m3.group(1)
-    return CARD_NAME_DEFAULT, "XXXX"
-
-def read_detail_text_quick(max_chars: int = 6000) -> str:
-    sels = [
-        "//*[@data-testid='offer-detail-text-and-disclaimer-link-container-id']",
-        "//*[@data-cy='offer-detail-text-and-disclaimer-link-container']",
-    ]
-    for xp in sels:
-        els = driver.find_elements(By.XPATH, xp)
-        if els:
-            try:
-                txt = "\n".join(e.text for e in els if e.text.strip())
-                return txt[:max_chars]
-            except Exception:
-                pass
-    try:
-        return driver.find_element(By.TAG_NAME, "body").text[:max_chars]
-    except Exception:
-        return ""
-
-def read_offer_header_quick() -> Tuple[str, str]:
-    disc = ""
-    limit = ""
-    try:
-        amt = driver.find_elements(By.CSS_SELECTOR, "[data-testid='offerAmount']")
-        if amt and amt[0].text.strip():
-            disc = amt[0].text.strip()
-    except Exception:
-        pass
+def parse_card_and_last4(pay_text: str, body: str) -> Tuple[str, str]:
+    m = PAY_WITH_RE.search(pay_text or "")
+    if m:
+        return m.group(1).strip() + " Card", m.group(2)
+    # One scan for both forms; "ending in" still wins over an earlier "(...1234)"
+    paren = None
+    for m in LAST4_RE.finditer(body or ""):
+        if m.group("ending"):
+            return CARD_NAME_DEFAULT, m.group("ending")
+        paren = paren or m.group("paren")
+    return CARD_NAME_DEFAULT, paren or "XXXX"
+
+# Everything the detail page gives us in one round-trip. The full body text only
+# crosses the wire when the "Pay with" span can't supply the last four.
+_DETAIL_JS = """
+const max = arguments[0], payRe = new RegExp(arguments[1]);
+const first = sel => { const e = document.querySelector(sel); return e ? (e.innerText || '').trim() : ''; };
+const body = document.body ? document.body.innerText : '';
+const payEl = document.evaluate(arguments[2], document, null,
+                                XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const pay = payEl ? (payEl.innerText || '').trim() : '';
+let terms = null;
+for (const sel of ["[data-testid='offer-detail-text-and-disclaimer-link-container-id']",
+                   "[data-cy='offer-detail-text-and-disclaimer-link-container']"]) {
+  const els = Array.from(document.querySelectorAll(sel));
+  if (els.length) { terms = els.map(e => e.innerText || '').filter(t => t.trim()).join('\\n'); break; }
+}
+return {
+  disc: first("[data-testid='offerAmount']"),
+  limit: first("[data-testid='limitations']"),
+  pay: pay,
+  body: payRe.test(pay) ? '' : body,
+  terms: (terms === null ? body : terms).slice(0, max),
+};
+"""
+
+def read_offer_detail(max_chars: int = 6000) -> Dict[str, str]:
+    """Header discount/limit, "Pay with" text, body (if needed) and terms text (trimmed to max_chars)."""
     try:
-        lim = driver.find_elements(By.CSS_SELECTOR, "[data-testid='limitations']")
-        if lim and lim[0].text.strip():
-            limit = lim[0].text.strip()
+        data = driver.execute_script(_DETAIL_JS, max_chars, PAY_WITH_RE.pattern, PAY_WITH_XPATH) or {}
     except Exception:
-        pass
-    return disc, limit
+        data = {}
+    return {k: str(data.get(k) or "") for k in ("disc", "limit", "pay", "body", "terms")}
+
+# All terms-text fields in one pass: each field is a zero-width lookahead, so
+# overlapping hits still register and the scan stops once every field is found.
+TERMS_FIELDS = {
+    "max_after": MAX_AFTER_RE, "max_before": MAX_BEFORE_RE, "min": MIN_SPEND_RE,
+    "exp": EXPIRES_RE, "exp_in": EXPIRES_IN_RE, "local": LOCAL_RE, "address": ADDRESS_RE,
+}
+TERMS_RE = re.compile("|".join(
+    f"(?=(?P<{name}>{'(?i:' if pat.flags & re.I else '(?:'}{pat.pattern})))"
+    for name, pat in TERMS_FIELDS.items()
+))
+
+def scan_terms(terms_text: str) -> dict:
+    """First match per TERMS_FIELDS name, from a single finditer over the text."""
+    hits = {}
+    for m in TERMS_RE.finditer(terms_text):
+        name = m.lastgroup
+        if name in hits:
+            continue
+        hits[name] = TERMS_FIELDS[name].match(terms_text, m.start())
+        if {"max_after", "min", "exp"} <= hits.keys() and ("local" in hits or "address" in hits):
+            break
+    return hits
 
 def parse_limits_local_expiration(terms_text: str, hdr_limit: str = "") -> Tuple[str, str, str, str]:
+    hits = scan_terms(terms_text)
+
     maxd = ""
-    m = re.search(r"\$\s?([\d,]+(?:\.\d{2})?)\s*(?:cash\s*back\s*)?(?:maximum|max)\b", terms_text, re.I)
+    m = hits.get("max_after") or hits.get("max_before")
     if m: maxd = f"${m.group(1)}"
-    if not maxd:
-        m = re.search(r"[Mm]ax(?:imum)?[^$]{0,25}\$(\d[\d,]*(?:\.\d{2})?)", terms_text)
-        if m: maxd = f"${m.group(1)}"
 
     mind = ""
-    m = re.search(r"(?:spend|purchase)[^$]{0,25}\$(\d[\d,]*(?:\.\d{2})?)", terms_text, re.I)
+    m = hits.get("min")
     if m: mind = f"${m.group(1)}"
     if not mind and hdr_limit:
-        m2 = re.search(r"\$(\d[\d,]*(?:\.\d{2})?)", hdr_limit)
+        m2 = DOLLAR_RE.search(hdr_limit)
         if m2: mind = f"${m2.group(1)}"
 
     exp = ""
-    m = re.search(r"(?:Expires?|Offer expires|Exp\.)\s*(?:on\s*)?([A-Za-z]{3,9}\s+\d{1,2},\s*\d{2,4}|\d{1,2}/\d{1,2}/\d{2,4})", terms_text, re.I)
-    if m: exp = normalize_date_out(m.group(1))
-    else:
-        m2 = re.search(r"expires?\s+in\s+\d+\s+days", terms_text, re.I)
-        if m2: exp = normalize_date_out(m2.group(0))
+    if "exp" in hits: exp = normalize_date_out(hits["exp"].group(1))
+    elif "exp_in" in hits: exp = normalize_date_out(hits["exp_in"].group(0))
 
-    local = "Yes" if re.search(r"Offer only applies to the following location", terms_text, re.I) else "No"
-    if local == "No" and re.search(r"\n\d{2,5}\s+.+\n[A-Za-z\s]+,\s*[A-Z]{2}\s+\d{5}", terms_text):
-        local = "Yes"
+    local = "Yes" if ("local" in hits or "address" in hits) else "No"
 
     return maxd, (mind or "None"), exp, local
 
+# All three brand strategies in one round-trip; arguments are NOT_BRAND_RE / NOT_HEADING_RE
+_BRAND_JS = """
+const notBrand = new RegExp(arguments[0], 'i'), notHeading = new RegExp(arguments[1], 'i');
+const text = e => (e.innerText || '').trim();
+const added = Array.from(document.querySelectorAll('*'))
+  .find(e => /added to card/i.test(e.textContent || ''));
+if (added) {
+  for (let p = added.previousElementSibling; p; p = p.previousElementSibling) {
+    const t = text(p);
+    if (t && t.length <= 80) {
+      if (!notBrand.test(t)) return t;
+      break;
+    }
+  }
+}
+for (const sel of ["[data-testid='merchantName']", "[data-testid='brandName']",
+                   "div[class*='merchant'] span", "div[class*='brand'] span"]) {
+  const e = document.querySelector(sel);
+  const t = e ? text(e) : '';
+  if (t && !notBrand.test(t)) return t;
+}
+const heads = document.querySelectorAll("h1, h2, h3, [role='heading']");
+for (const h of Array.from(heads).slice(0, 6)) {
+  const t = text(h);
+  if (t && !notHeading.test(t) && t.length >= 2 && t.length <= 60) return t;
+}
+return '';
+"""
+
 def extract_brand_smart(tile_guess: str = "") -> str:
     try:
-        js = """
-        const added = Array.from(document.querySelectorAll('*'))
-          .find(e => /added to card/i.test(e.textContent||''));
-        if (added) {
-            let p = added.previousElementSibling;
-            while (p) {
-                const t = (p.innerText||'').trim();
-                if (t && t.length <= 80) return t;
-                p = p.previousElementSibling;
-            }
-        }
-        return '';
-        """
-        val = driver.execute_script(js) or ""
-        if val and not re.search(r"cash\\s*back|\\$\\d", val, re.I):
-            return val.strip()
-    except Exception:
-        pass
-    for sel in ("[data-testid='merchantName']","[data-testid='brandName']","div[class*='merchant'] span","div[class*='brand'] span"):
-        try:
-            els = driver.find_elements(By.CSS_SELECTOR, sel)
-            if els and els[0].text.strip():
-                txt = els[0].text.strip()
-                if not re.search(r"cash\s*back|\$\d", txt, re.I):
-                    return txt
-        except Exception:
-            pass
-    try:
-        heads = driver.find_elements(By.XPATH, "//*[self::h1 or self::h2 or self::h3 or @role='heading']")
-        for h in heads[:6]:
-            txt = (h.text or "").strip()
-            if txt and not re.search(r"cash\s*back|\$\d|about this deal", txt, re.I) and 2 <= len(txt) <= 60:
-                return txt
+        val = (driver.execute_script(_BRAND_JS, NOT_BRAND_RE.pattern, NOT_HEADING_RE.pattern) or "").strip()
+        if val:
+            return val
     except Exception:
         pass
     return tile_guess.strip() or BRAND_FALLBACK
@@ -531,42 +781,39 @@ def extract_brand_smart(tile_guess: str = "") -> str:
 # -------------------------------
 # Offer actions
 # -------------------------------
-def find_add_buttons() -> list:
-    sels = [
-        "button[aria-label*='Add offer']",
-        "[data-testid='addOfferButton']",
-        "mds-icon[data-testid='commerce-tile-button']",
-        "button[aria-label^='Add ']"
-    ]
-    found = []
-    for sel in sels:
-        try:
-            found.extend(driver.find_elements(By.CSS_SELECTOR, sel))
-        except Exception:
-            pass
-    # Prefer visible ones
-    return [b for b in found if b.is_displayed()]
-
-def click_add_target(el) -> bool:
+# Clicks window.__chaseAddButtons[i] (filled by tile_snapshot) after walking up to its button
+_CLICK_ADD_JS = """
+let node = (window.__chaseAddButtons || [])[arguments[0]];
+if (!node || !node.isConnected) return false;
+for (let i = 0; i < 5 && node.parentElement; i++) {
+  if (node.tagName.toLowerCase() === 'button' || node.getAttribute('role') === 'button') break;
+  node = node.parentElement;
+}
+node.scrollIntoView({block: 'center'});
+node.click();
+return true;
+"""
+
+def click_add_target(idx: int, el=None) -> bool:
+    """Click the snapshot's idx-th add button in one round-trip; el is the fallback handle."""
     try:
-        node = el
-        for _ in range(5):
-            if node.tag_name.lower() == "button" or node.get_attribute("role") == "button":
-                break
-            node = node.find_element(By.XPATH, "./..")
-        driver.execute_script("arguments[0].scrollIntoView({block:'center'});", node)
-        time.sleep(FAST_CLICK_DELAY)
-        driver.execute_script("arguments[0].click();", node)
+        if driver.execute_script(_CLICK_ADD_JS, idx):
+            return True
+    except Exception:
+        pass
+    if el is None:
+        return False
+    try:
+        driver.execute_script("arguments[0].click();", el)
         return True
     except Exception:
-        try:
-            driver.execute_script("arguments[0].click();", el)
-            return True
-        except Exception:
-            return False
+        return False
 
 def close_enroll_error_if_present():
     try:
+        # Cheap guard: the error XPath below only matches inside a dialog/modal, so skip it if none exists
+        if not driver.execute_script("return !!document.querySelector('[role=dialog], [class*=modal]');"):
+            return
         xp = ("//*[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),"
               "'unable to enroll merchant offer')]/ancestor::*[@role='dialog' or contains(@class,'modal')]")
         modals = driver.find_elements(By.XPATH, xp)
@@ -579,98 +826,162 @@ def close_enroll_error_if_present():
         pass
 
 def quick_back():
+    prev_url = driver.current_url
+    went_back = False
     btns = driver.find_elements(By.CSS_SELECTOR, "[aria-label='Back']")
     if btns:
         try:
             driver.execute_script("arguments[0].click();", btns[0])
-            time.sleep(FAST_BACK_WAIT)
-            return
+            went_back = True
         except Exception:
             pass
-    driver.execute_script("window.history.back();")
-    time.sleep(FAST_BACK_WAIT)
+    if not went_back:
+        driver.execute_script("window.history.back();")
+
+    # 1) off the detail page, 2) list re-rendered (the card's last offer leaves none, so cap it)
+    try:
+        WebDriverWait(driver, 10, poll_frequency=0.05).until(
+            lambda _: (st := click_state()).get("href") not in (None, prev_url) and not st.get("detail"))
+        WebDriverWait(driver, FAST_BACK_WAIT * 8, poll_frequency=0.05).until(lambda _: add_buttons_count() > 0)
+    except TimeoutException:
+        pass
 
-def tile_fingerprint(tile) -> str:
+def _digest64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+def tile_fingerprint(norm: str) -> int:
+    """64-bit blake2b digest of a tile's fp (whitespace-collapsed, first 200 chars, built in JS)."""
+    return _digest64(norm or "")
+
+def row_key(row) -> int:
+    """64-bit digest of a sheet row; cells joined with the unit separator so they can't run together."""
+    return _digest64("\x1f".join(str(c) for c in row))
+
+_TILE_SNAPSHOT_JS = """
+const out = [], seen = new Set();
+window.__chaseAddButtons = [];
+for (const b of document.querySelectorAll(arguments[0])) {
+  if (seen.has(b)) continue;
+  seen.add(b);
+  const r = b.getBoundingClientRect();
+  if (!(r.width > 0 && r.height > 0)) continue;
+  const tile = b.parentElement && b.parentElement.closest('div');
+  if (!tile) continue;
+  let brand = '';
+  for (const sel of ['h3', 'h2', "div[role='heading']"]) {
+    const h = tile.querySelector(sel);
+    if (h && (h.innerText || '').trim()) { brand = h.innerText.trim(); break; }
+  }
+  const text = tile.innerText || '';
+  out.push({idx: window.__chaseAddButtons.push(b) - 1, el: b, text: text, brand: brand,
+            fp: text.trim().replace(/\\s+/g, ' ').slice(0, 200)});
+}
+return out;
+"""
+
+def tile_snapshot() -> List[dict]:
+    """Visible add buttons with their tile text + heading, in one execute_script.
+
+    The buttons are also kept in window.__chaseAddButtons so click_add_target can click by idx.
+    """
     try:
-        txt = (tile.text or "").strip()
-        txt = re.sub(r"\s+", " ", txt)[:200]
-        return txt
+        return driver.execute_script(_TILE_SNAPSHOT_JS, ADD_BUTTON_CSS) or []
     except Exception:
-        return str(time.time())
-
-def expand_all_offers_if_present():
-    # Click "Show more / Load more / See all offers" once if present
-    for xp in (
-        "//button[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'show more')]",
-        "//button[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'load more')]",
-        "//a[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'see all offers')]",
-    ):
-        try:
-            btns = [b for b in driver.find_elements(By.XPATH, xp) if b.is_displayed()]
-            if btns:
-                driver.execute_script("arguments[0].click();", btns[0])
-                time.sleep(0.5)
-        except Exception:
-            pass
+        return []
+
+SHOW_MORE_XPATHS = (
+    "//button[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'show more')]",
+    "//button[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'load more')]",
+    "//a[contains(translate(.,'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),'see all offers')]",
+)
 
-def gentle_scroll_through():
-    # helps lazy-load tiles
+# Click each visible "Show more / Load more / See all offers" once, then step down the page
+# (500px / 120ms) until the bottom, re-reading scrollHeight so lazy-loaded tiles extend the walk.
+_EXPAND_AND_SCROLL_JS = """
+const done = arguments[arguments.length - 1];
+const sleep = ms => new Promise(r => setTimeout(r, ms));
+const height = () => document.body.scrollHeight || document.documentElement.scrollHeight;
+(async () => {
+  for (const xp of arguments[0]) {
+    const snap = document.evaluate(xp, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (let i = 0; i < snap.snapshotLength; i++) {
+      const b = snap.snapshotItem(i), r = b.getBoundingClientRect();
+      if (r.width > 0 && r.height > 0) { b.click(); await sleep(500); break; }
+    }
+  }
+  for (let y = 0, steps = 0; y < height() && steps < 150; y += 500, steps++) {
+    window.scrollTo(0, y);
+    await sleep(120);
+  }
+  window.scrollTo(0, 0);
+  await sleep(150);
+  return height();
+})().then(done, () => done(0));
+"""
+
+def expand_and_scroll_offers() -> int:
+    """Expand + lazy-load every tile in one execute_async_script; returns the final scrollHeight."""
     try:
-        h = driver.execute_script("return document.body.scrollHeight || document.documentElement.scrollHeight;")
-        for y in range(0, int(h), 500):
-            driver.execute_script("window.scrollTo(0, arguments[0]);", y)
-            time.sleep(0.12)
-        driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(0.15)
+        return int(driver.execute_async_script(_EXPAND_AND_SCROLL_JS, list(SHOW_MORE_XPATHS)) or 0)
     except Exception:
-        pass
+        return 0
+
+def buffer_row(row: List[str]):
+    """Queue an offer row; only hits Sheets once the buffer reaches APPEND_CHUNK_SIZE."""
+    key = row_key(row)
+    if key in BUFFER_KEYS:
+        return
+    BUFFER_KEYS.add(key)
+    APPEND_BUFFER.append(row)
+    if len(APPEND_BUFFER) >= APPEND_CHUNK_SIZE:
+        flush_buffer()
 
-def enroll_all_offers_for_current_card(existing_rows: Set[Tuple[str,...]]) -> int:
-    global APPEND_BUFFER, CURRENT_CARD_BUFFER
-    CURRENT_CARD_BUFFER = []
-    per_card_rows: List[List[str]] = []
-    per_card_keys: Set[tuple] = set()
-    processed_fps: Set[str] = set()
+def enroll_all_offers_for_current_card(existing_rows: Set[int]) -> int:
+    per_card_keys: Set[int] = set()
+    processed_fps: Set[int] = set()
     added_total = 0
 
-    expand_all_offers_if_present()
-    gentle_scroll_through()
+    expand_and_scroll_offers()
 
     # Give tiles a moment to appear
-    t0 = time.time()
-    while time.time() - t0 < 12.0:
-        if add_buttons_present():
-            break
-        time.sleep(0.2)
+    try:
+        _present(ADD_BUTTON_CSS, timeout=12.0)
+    except TimeoutException:
+        pass
 
     idle_cycles = 0
     safety_clicks = 0
+    # Tiles from the last snapshot not yet tried; re-snapshot only once it runs dry,
+    # after navigating back (DOM rebuilt), or when a reused button turns out stale
+    pending: List[dict] = []
     print(f"[offers] starting scan...")
 
     while True:
-        buttons = find_add_buttons()
         picked = None
-        picked_tile = None
         picked_fp = None
-
-        for btn in buttons:
-            try:
-                # parent tile
-                t = btn.find_element(By.XPATH, "./ancestor::*[self::div][1]")
-                fp = tile_fingerprint(t)
-                if fp in processed_fps:
-                    # hide to avoid reprocessing
-                    try: driver.execute_script("arguments[0].style.display='none';", btn)
-                    except Exception: pass
-                    continue
-                picked = btn
-                picked_tile = t
-                picked_fp = fp
-                break
-            except Exception:
+        picked_idx = -1
+        fresh = not pending
+        if fresh:
+            pending = tile_snapshot()
+
+        while pending:
+            item = pending.pop(0)
+            fp = tile_fingerprint(item.get("fp"))
+            if fp in processed_fps:
+                # hide to avoid reprocessing
+                try: driver.execute_script("arguments[0].style.display='none';", item["el"])
+                except Exception: pass
                 continue
+            picked = item["el"]
+            picked_fp = fp
+            picked_idx = int(item.get("idx", -1))
+            tile_text = item.get("text") or ""
+            tile_brand_guess = (item.get("brand") or "").strip()
+            break
 
         if not picked:
+            if not fresh:
+                continue  # leftovers were all done; look at the page again
             idle_cycles += 1
             if idle_cycles >= 3:
                 break
@@ -683,20 +994,14 @@ def enroll_all_offers_for_current_card(existing_rows: Set[Tuple[str,...]]) -> in
             print("[offers] safety stop: too many clicks.")
             break
 
-        tile_text = (picked_tile.text or "")
-        # Brand guess from tile
-        tile_brand_guess = ""
-        try:
-            for sel in (".//h3", ".//h2", ".//div[@role='heading']"):
-                els = picked_tile.find_elements(By.XPATH, sel)
-                if els and els[0].text.strip():
-                    tile_brand_guess = els[0].text.strip()
-                    break
-        except Exception:
-            pass
         disc_tile = parse_discount_from_sources(tile_text)
 
-        if not click_add_target(picked):
+        before = click_state()
+        if not click_add_target(picked_idx, picked):
+            if not fresh:
+                # Probably re-rendered under us; take a new snapshot before giving up on it
+                pending = []
+                continue
             # if can't click, mark processed to avoid loop
             processed_fps.add(picked_fp)
             try: driver.execute_script("arguments[0].style.display='none';", picked)
@@ -704,34 +1009,37 @@ def enroll_all_offers_for_current_card(existing_rows: Set[Tuple[str,...]]) -> in
             continue
 
         # Wait briefly for detail OR immediate "Added" state
-        t1 = time.time()
-        navigated = False
-        while time.time() - t1 < 2.4:
-            if driver.find_elements(By.XPATH, "//span[starts-with(normalize-space(),'Pay with ')]"):
-                navigated = True
-                break
-            # or tile might change in place; short pause
-            time.sleep(0.1)
+        def _settled(_):
+            st = click_state()
+            if st.get("detail"):
+                return st
+            # or tile changed in place: same URL, one add button fewer
+            if st.get("href") == before.get("href") and st.get("n", 0) < before.get("n", 0):
+                return st
+            return False
+        settled = _wait_until(_settled, 2.4)
+        navigated = bool(settled and settled.get("detail"))
 
         close_enroll_error_if_present()
 
         if navigated:
             # parse detail page
-            header_disc, header_lim = read_offer_header_quick()
-            card_name, last4 = parse_card_and_last4_quick()
-            terms = read_detail_text_quick()
+            detail = read_offer_detail()
+            header_disc, header_lim = detail["disc"], detail["limit"]
+            card_name, last4 = parse_card_and_last4(detail["pay"], detail["body"])
+            terms = detail["terms"]
             maxd, mind, exp_norm, local = parse_limits_local_expiration(terms, hdr_limit=header_lim)
             discount = (parse_discount_from_sources(header_disc, disc_tile, terms, tile_text)
                         or header_disc or disc_tile or "Unknown")
             brand = extract_brand_smart(tile_brand_guess)
             row = [HOLDER, last4, card_name, brand, discount, maxd, mind,
-                   datetime.today().strftime("%b %d, %Y"), exp_norm, local]
-            key = tuple(row)
+                   TODAY_STR, exp_norm, local]
+            key = row_key(row)
             if key not in existing_rows and key not in per_card_keys:
-                per_card_rows.append(row); CURRENT_CARD_BUFFER.append(row)
+                buffer_row(row)
                 per_card_keys.add(key); existing_rows.add(key); added_total += 1
             quick_back()
-            time.sleep(FAST_BETWEEN)
+            pending = []
         else:
             # tile-only add; record minimal info using tile text
             card_name, last4 = CARD_NAME_DEFAULT, "XXXX"
@@ -739,24 +1047,14 @@ def enroll_all_offers_for_current_card(existing_rows: Set[Tuple[str,...]]) -> in
             brand = tile_brand_guess or extract_brand_smart(tile_brand_guess)
             maxd = mind = exp = ""; local = "No"
             row = [HOLDER, last4, card_name, brand, discount, maxd, (mind or "None"),
-                   datetime.today().strftime("%b %d, %Y"), exp, local]
-            key = tuple(row)
+                   TODAY_STR, exp, local]
+            key = row_key(row)
             if key not in existing_rows and key not in per_card_keys:
-                per_card_rows.append(row); CURRENT_CARD_BUFFER.append(row)
+                buffer_row(row)
                 per_card_keys.add(key); existing_rows.add(key); added_total += 1
 
         processed_fps.add(picked_fp)
 
-    if per_card_rows:
-        try:
-            OFFER_WS.append_rows(per_card_rows, value_input_option="RAW", insert_data_option="INSERT_ROWS")
-            CURRENT_CARD_BUFFER = []
-            print(f"[offers] appended {len(per_card_rows)} row(s).")
-            reset_filters_full_range()
-        except Exception as exc:
-            APPEND_BUFFER.extend(per_card_rows)
-            print(f"[offers] append failed; buffered {len(per_card_rows)} row(s): {exc}")
-
     print(f"[offers] done – {added_total} new row(s).")
     return added_total
 
@@ -778,29 +1076,17 @@ def current_account_id() -> str:
 
 def wait_for_dropdown_ready(max_wait: float = 8.0) -> bool:
     """Wait until the account dropdown has at least one option registered in the DOM."""
-    t0 = time.time()
-    while time.time() - t0 < max_wait:
-        try:
-            ready = driver.execute_script(
-                "return !!document.querySelector('mds-select#select-credit-card-account mds-select-option');"
-            )
-            if ready:
-                return True
-        except Exception:
-            pass
-        time.sleep(0.2)
-    return False
+    return bool(_wait_until(lambda d: d.execute_script(
+        "return !!document.querySelector('mds-select#select-credit-card-account mds-select-option');"
+    ), max_wait))
 
 def open_hub() -> bool:
     if not robust_get(CHASE_OFFER_HUB, tries=2):
         print("[hub] nav failed.")
         return False
-    t0 = time.time()
-    while time.time() - t0 < 8.0:
-        if hub_shell_present():
-            print("[hub] shell detected.")
-            return True
-        time.sleep(0.2)
+    if _wait_until(lambda _: hub_shell_present(), 8.0):
+        print("[hub] shell detected.")
+        return True
     print("[hub] shell not detected.")
     return False
 
@@ -808,6 +1094,9 @@ def select_account_by_id(acc_id: str) -> bool:
     """Click the dropdown option for this accountId inside shadow DOM, then verify selection."""
     print(f"[acct] selecting {acc_id}")
     try:
+        # Remember a tile from the current card so we can tell when it re-renders
+        old_tiles = driver.find_elements(By.CSS_SELECTOR, ADD_BUTTON_CSS)
+
         # Open the dropdown
         trig = driver.find_elements(By.XPATH, "//button[@id='select-select-credit-card-account']")
         if trig:
@@ -816,7 +1105,6 @@ def select_account_by_id(acc_id: str) -> bool:
             btn = driver.find_elements(By.XPATH, "//*[@id='select-credit-card-account']")
             if btn:
                 driver.execute_script("arguments[0].click();", btn[0])
-        time.sleep(0.25)
 
         # Wait until the options are actually there (SPA sometimes lags)
         wait_for_dropdown_ready(10.0)
@@ -834,12 +1122,11 @@ def select_account_by_id(acc_id: str) -> bool:
         print(f"[acct] shadow click: {res}")
 
         # Verify the hidden input actually reflects the selection
-        t0 = time.time()
-        while time.time() - t0 < 8.0:
-            if current_account_id() == acc_id:
-                time.sleep(CARD_LOAD_PAUSE)
-                return True
-            time.sleep(0.12)
+        if _wait_until(lambda _: current_account_id() == acc_id, 8.0):
+            # CARD_LOAD_PAUSE is now an upper bound: stop as soon as the old tiles are gone
+            if old_tiles:
+                _wait_until(EC.staleness_of(old_tiles[0]), CARD_LOAD_PAUSE, poll=0.05)
+            return True
 
         print("[acct] selection did not confirm in time.")
         return False
@@ -862,44 +1149,31 @@ def go_to_categories_for(acc_id: str) -> bool:
     _ = select_account_by_id(acc_id)  # best effort; we verify tiles below
 
     # Try to stay on offer-hub and get tiles
-    tried_click_all = False
-    applied_fallback_hash = False
     t0 = time.time()
-    while time.time() - t0 < 14.0:
-        if add_buttons_present():
-            return True
-
-        # Try clicking an "All" tab/link if present on hub once
-        if not tried_click_all:
-            try:
-                all_tabs = driver.find_elements(
-                    By.XPATH,
-                    "//*[self::a or self::button][normalize-space()='All' or contains(., 'All')]"
-                )
-                if all_tabs:
-                    driver.execute_script("arguments[0].click();", all_tabs[0])
-                    tried_click_all = True
-                    time.sleep(0.9)
-                    continue
-            except Exception:
-                tried_click_all = True  # don't loop on this
+    if add_buttons_present():
+        return True
 
-        # After ~6s, apply a single fallback to categories ALL
-        if not applied_fallback_hash and (time.time() - t0 > 6.0):
-            try:
-                hash_route = f"/dashboard/merchantOffers/offerCategoriesPage?accountId={acc_id}&offerCategoryName=ALL"
-                driver.execute_script("window.location.hash = arguments[0];", hash_route)
-                applied_fallback_hash = True
-                time.sleep(0.8)
-                continue
-            except Exception:
-                applied_fallback_hash = True
+    # Try clicking an "All" tab/link if present on hub once
+    try:
+        all_tabs = driver.find_elements(
+            By.XPATH,
+            "//*[self::a or self::button][normalize-space()='All' or contains(., 'All')]"
+        )
+        if all_tabs:
+            driver.execute_script("arguments[0].click();", all_tabs[0])
+    except Exception:
+        pass
 
-        # Accept either hub shell or categories shell while we wait
-        if categories_shell_present():
-            if add_buttons_present():
-                return True
-        time.sleep(0.25)
+    # Give the hub ~6s, then apply a single fallback to categories ALL
+    if _wait_until(lambda _: add_buttons_present(), max(0.0, 6.0 - (time.time() - t0))):
+        return True
+    try:
+        hash_route = f"/dashboard/merchantOffers/offerCategoriesPage?accountId={acc_id}&offerCategoryName=ALL"
+        driver.execute_script("window.location.hash = arguments[0];", hash_route)
+    except Exception:
+        pass
+    if _wait_until(lambda _: add_buttons_present(), max(0.0, 14.0 - (time.time() - t0))):
+        return True
 
     print("[cat] categories/hub not confirmed with visible add buttons.")
     return add_buttons_present()
@@ -927,8 +1201,40 @@ def go_to_categories_for(acc_id: str) -> bool:
 # -------------------------------
 # Card loop
 # -------------------------------
+def load_card_scans() -> Dict[str, float]:
+    try:
+        with open(CARD_SCAN_PATH, "r", encoding="utf-8") as fh:
+            return {str(k): float(v) for k, v in json.load(fh).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+def save_card_scans(scans: Dict[str, float]):
+    try:
+        with open(CARD_SCAN_PATH, "w", encoding="utf-8") as fh:
+            json.dump(scans, fh)
+    except OSError as exc:
+        print(f"[cards] could not save scan cache: {exc}")
+
+def card_recently_empty(scans: Dict[str, float], acc_id: str) -> bool:
+    """True if this card showed no add buttons within CARD_CACHE_HOURS."""
+    if CARD_CACHE_HOURS <= 0 or acc_id not in scans:
+        return False
+    return time.time() - scans[acc_id] < CARD_CACHE_HOURS * 3600
+
+def offers_view_empty(acc_id: str) -> bool:
+    """This card's hub/categories page finished loading and has no add buttons on it."""
+    on_card = current_account_id() == acc_id or f"accountId={acc_id}" in (driver.current_url or "")
+    return (on_card
+            and _any_match(HUB_SHELL_XPATHS + CATEGORIES_SHELL_XPATHS[:2])
+            and not _any_match(CATEGORIES_SHELL_XPATHS[3:])  # still skeleton/loading
+            and not add_buttons_present())
+
 def process_cards():
-    existing_rows: Set[Tuple[str, ...]] = {tuple(r) for r in OFFER_WS.get_all_values()[1:]}
+    global ROW_COUNT, TODAY_STR
+    values = OFFER_WS.get_all_values()
+    ROW_COUNT = len(values)
+    existing_rows: Set[int] = {row_key(r) for r in values[1:]}
+    scans = load_card_scans()
     total_cards = 0
     total_rows  = 0
 
@@ -936,17 +1242,28 @@ def process_cards():
         if acc_id in FINISHED_ACCOUNTS:
             print(f"\n----- Card {idx}/{len(ACCOUNT_IDS)} – accountId={acc_id} (already finished; skipping)")
             continue
+        if card_recently_empty(scans, acc_id):
+            # Nothing was left to add last time; don't pay for the navigation again
+            print(f"\n----- Card {idx}/{len(ACCOUNT_IDS)} – accountId={acc_id} (no offers on last scan; skipping)")
+            FINISHED_ACCOUNTS.add(acc_id)
+            continue
 
         print(f"\n----- Card {idx}/{len(ACCOUNT_IDS)} – accountId={acc_id}")
+        TODAY_STR = datetime.today().strftime("%b %d, %Y")
         try:
             if not go_to_categories_for(acc_id):
-                print("[card] offers view not ready; skipping.")
+                # A fully enrolled card lands here too; cache it so the next run skips the wait
+                if offers_view_empty(acc_id):
+                    print("[card] no offers left to add.")
+                    scans[acc_id] = time.time()
+                else:
+                    print("[card] offers view not ready; skipping.")
                 FINISHED_ACCOUNTS.add(acc_id)  # don't bounce back to a broken one in this run
                 total_cards += 1
                 continue
 
             # Quick read of visible add buttons before starting
-            had_buttons = len(find_add_buttons())
+            had_buttons = add_buttons_count()
             added = enroll_all_offers_for_current_card(existing_rows)
             print(f"[card] {idx} -> {added} new row(s).")
             total_rows += max(0, added)
@@ -955,14 +1272,25 @@ def process_cards():
             # Mark as finished if nothing else to add (either no buttons or nothing added)
             if added == 0 or not had_buttons:
                 FINISHED_ACCOUNTS.add(acc_id)
+
+            # Only an empty page is cached; a card we just worked may still have stragglers
+            if not had_buttons:
+                scans[acc_id] = time.time()
+            else:
+                scans.pop(acc_id, None)
         except Exception as exc:
             sheet_log("ERROR", "card", f"{acc_id}: {type(exc).__name__}: {exc}")
             print(f"[card] error {acc_id}: {exc}")
             FINISHED_ACCOUNTS.add(acc_id)
             continue
+        finally:
+            if not COALESCE_CARDS and flush_buffer():
+                reset_filters_full_range()
 
         time.sleep(0.7)
 
+    flush_buffer()
+    save_card_scans(scans)
     print(f"[cards] complete – {total_cards} card(s), {total_rows} row(s).")
 
 
@@ -978,64 +1306,78 @@ def normalize_sheet_dates():
             raw = row[col_idx].strip() if col_idx < len(row) else ""
             norm = normalize_date_out(raw) if raw else ""
             if norm and norm != raw:
-                updates.append((i + 1, col_idx + 1, norm))
-    for (r, c, v) in updates:
-        OFFER_WS.update_cell(r, c, v)
+                updates.append({"range": rowcol_to_a1(i + 1, col_idx + 1), "values": [[norm]]})
+    # One values.batchUpdate per 500 cells instead of an update_cell per cell
+    for start in range(0, len(updates), 500):
+        OFFER_WS.batch_update(updates[start:start + 500], value_input_option="USER_ENTERED")
     print(f"[sheet] normalized {len(updates)} date cell(s).")
 
 def dedupe_rows() -> int:
     rows = OFFER_WS.get_all_values()
-    seen = set(); sid = OFFER_WS._properties["sheetId"]; req = []
+    seen = set(); dups = []
     for i in range(len(rows) - 1, 0, -1):
         key = tuple(rows[i])
         if key in seen:
-            req.append({"deleteRange": {"range": {"sheetId": sid, "startRowIndex": i, "endRowIndex": i + 1},
-                                        "shiftDimension": "ROWS"}})
+            dups.append(i)
         else:
             seen.add(key)
+    # dups is descending; merge adjacent indices into [start, end) spans, still bottom-up
+    spans: List[List[int]] = []
+    for i in dups:
+        if spans and spans[-1][0] == i + 1:
+            spans[-1][0] = i
+        else:
+            spans.append([i, i + 1])
+    req = [{"deleteRange": {"range": {"sheetId": SHEET_ID, "startRowIndex": a, "endRowIndex": b},
+                            "shiftDimension": "ROWS"}} for a, b in spans]
     if req:
         OFFER_WS.spreadsheet.batch_update({"requests": req})
-    print(f"[sheet] deduped {len(req)} row(s).")
-    return len(req)
-
-def reset_filters_full_range():
-    values = OFFER_WS.get_all_values()
-    last_row = max(1, len(values))
-    last_col = len(OFFER_HEADERS)
-    sid = OFFER_WS._properties["sheetId"]
+    global ROW_COUNT
+    ROW_COUNT = len(rows) - len(dups)
+    print(f"[sheet] deduped {len(dups)} row(s) in {len(req)} range(s).")
+    return len(dups)
+
+def reset_filters_full_range(last_row: Optional[int] = None):
+    # The tracked ROW_COUNT saves re-reading the whole sheet just to size the filter
+    if last_row is None:
+        last_row = ROW_COUNT or len(OFFER_WS.get_all_values())
+    last_row = max(1, last_row)
     SHEET.batch_update({"requests": [
-        {"clearBasicFilter": {"sheetId": sid}},
+        {"clearBasicFilter": {"sheetId": SHEET_ID}},
         {"setBasicFilter": {"filter": {
-            "range": {"sheetId": sid, "startRowIndex": 0, "endRowIndex": last_row, "startColumnIndex": 0, "endColumnIndex": last_col}
+            "range": {"sheetId": SHEET_ID, "startRowIndex": 0, "endRowIndex": last_row, "startColumnIndex": 0, "endColumnIndex": LAST_COL}
         }}}]})
     print(f"[sheet] filter 1..{last_row}.")
 
 # -------------------------------
 # Main
 # -------------------------------
-def flush_buffer():
-    global APPEND_BUFFER, CURRENT_CARD_BUFFER
-
-    # In-run memory of finished accountIds (no need to revisit)
-    FINISHED_ACCOUNTS: Set[str] = set()
-    if CURRENT_CARD_BUFFER:
-        APPEND_BUFFER.extend(CURRENT_CARD_BUFFER)
-        CURRENT_CARD_BUFFER = []
+def flush_buffer() -> int:
+    """Append buffered rows in APPEND_CHUNK_SIZE chunks; returns how many were sent."""
+    global APPEND_BUFFER, ROW_COUNT
     if not APPEND_BUFFER:
         print("[flush] nothing to append.")
-        return
+        return 0
     total = 0
     try:
-        for i in range(0, len(APPEND_BUFFER), APPEND_CHUNK_SIZE):
-            chunk = APPEND_BUFFER[i:i + APPEND_CHUNK_SIZE]
+        while APPEND_BUFFER:
+            chunk = APPEND_BUFFER[:APPEND_CHUNK_SIZE]
             OFFER_WS.append_rows(chunk, value_input_option="RAW", insert_data_option="INSERT_ROWS")
+            APPEND_BUFFER = APPEND_BUFFER[len(chunk):]
+            BUFFER_KEYS.difference_update(row_key(r) for r in chunk)
+            ROW_COUNT += len(chunk)
             total += len(chunk)
         print(f"[flush] appended {total} buffered row(s).")
-        reset_filters_full_range()
     except Exception as exc:
-        print(f"[flush] error: {exc}")
-    finally:
-        APPEND_BUFFER = []
+        # Keep the unsent rows; the next flush (or exit) retries them
+        print(f"[flush] error ({len(APPEND_BUFFER)} row(s) kept): {exc}")
+    return total
+
+def flush_all():
+    flush_buffer()
+    flush_log_buffer()
+
+atexit.register(flush_all)
 
 def safe_quit():
     try:
@@ -1045,15 +1387,20 @@ def safe_quit():
 
 def main():
     try:
-        # 1) Home, prefill login
-        robust_get(CHASE_HOME_URL, tries=1)
-        prefill_home_login(U1, P1)
-        print("[login] Finish MFA in browser (I'll fill the extra password once on the code page if shown).")
-
-        # 2) Wait until dashboard/overview shows up
-        if not wait_for_post_login(LOGIN_WAIT_MAX):
-            print("[main] Post-login not detected – aborting.")
-            return
+        # 1) Reuse a recent session if we have one ...
+        if restore_session():
+            print(f"[login] Reused saved session: {driver.current_url}")
+        else:
+            # ... otherwise home, prefill login
+            robust_get(CHASE_HOME_URL, tries=1)
+            prefill_home_login(U1, P1)
+            print("[login] Finish MFA in browser (I'll fill the extra password once on the code page if shown).")
+
+            # 2) Wait until dashboard/overview shows up
+            if not wait_for_post_login(LOGIN_WAIT_MAX):
+                print("[main] Post-login not detected – aborting.")
+                return
+            save_session_cookies()
 
         # 3) Process cards
         process_cards()
@@ -1071,14 +1418,18 @@ def main():
         print(f"[main] Fatal – {type(exc).__name__}: {exc}")
         sheet_log("ERROR", "main", f"Fatal: {type(exc).__name__}: {exc}")
     finally:
-        flush_buffer()
+        flush_all()
         if CLOSE_ON_EXIT:
             safe_quit()
         else:
             print("[main] Browser left open – Ctrl+C here to exit.")
             try:
-                while True:
-                    time.sleep(3600)
+                if hasattr(signal, "pause"):
+                    signal.pause()  # POSIX: sleep until a signal arrives
+                else:
+                    # Windows has no signal.pause, and Event.wait() there ignores Ctrl+C
+                    while True:
+                        time.sleep(3600)
             except KeyboardInterrupt:
                 print("[main] Exiting; leaving browser window as-is.")
 